@@ -2,24 +2,65 @@ import pandas as pd
 import numpy as np
 import os
 import json
+import argparse
+import hashlib
+import time
 from google.oauth2.service_account import Credentials
 import gspread
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+import pyarrow as pa
+import requests
 
 # --- CONFIGURATION ---
 SLACK_TOKEN = os.getenv("SLACK_TOKEN")  # xoxb- token
 SLACK_CHANNEL = "#all-nba-fantasy-bot"  # channel to post messages
 GOOGLE_CREDENTIALS = os.getenv("GOOGLE_CREDENTIALS")
 SHEET_NAME = "Fantasy_NBA_Data"
+SHEET_TABS = ["projections", "roster", "waiver"]
+
+# Local copy of the sheet tabs, reused while the sheet's modifiedTime is unchanged
+CACHE_DIR = os.path.dirname(os.path.abspath(__file__))
+SHEETS_CACHE_DIR = os.path.join(CACHE_DIR, "sheets_cache")  # one <tab>.parquet per tab
+LAST_MODIFIED_FILE = os.path.join(CACHE_DIR, "last_modified.txt")
+# What a failed cache read/write can raise (disk errors, bad or unwritable parquet)
+CACHE_ERRORS = (OSError, ValueError, pa.ArrowException)
+# Hash of the last report posted to Slack, so unchanged reports aren't re-posted
+LAST_REPORT_HASH_FILE = os.path.join(CACHE_DIR, ".last_report_hash")
 
 # 8-cat league categories
 CATS = ["PTS", "REB", "AST", "STL", "BLK", "3PM", "FG%", "FT%"]
 
+# Retries on transient network / 429 / 5xx errors, per Sheets or Slack request
+HTTP_MAX_RETRIES = 3
+# Sheets retries wait HTTP_BACKOFF_SECONDS * 2**attempt (0.5 s, 1 s, 2 s)
+HTTP_BACKOFF_SECONDS = 0.5
+
+# Minimum RapidFuzz WRatio score for a fuzzy name match to count
+FUZZY_CUTOFF = 85
+# ...and how far ahead of the runner-up it must score to be unambiguous
+FUZZY_MARGIN = 5
+
 
 # --- GOOGLE SHEETS CONNECTION ---
-def connect_to_sheet():
-    """Authenticate and open your Google Sheet."""
+class RetryingHTTPClient(gspread.HTTPClient):
+    """gspread HTTP client that retries transient failures up to HTTP_MAX_RETRIES times."""
+
+    RETRY_STATUS = {408, 429}
+
+    def request(self, *args, **kwargs):
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            try:
+                return super().request(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                if attempt == HTTP_MAX_RETRIES or not (e.code in self.RETRY_STATUS or e.code >= 500):
+                    raise
+            except requests.exceptions.ConnectionError:
+                if attempt == HTTP_MAX_RETRIES:
+                    raise
+            time.sleep(HTTP_BACKOFF_SECONDS * 2**attempt)
+
+
+def connect_to_sheets():
+    """Authenticate with Google Sheets and return the gspread client."""
     if not GOOGLE_CREDENTIALS:
         raise ValueError("❌ Missing GOOGLE_CREDENTIALS secret in GitHub!")
 
@@ -30,80 +71,272 @@ def connect_to_sheet():
 
     creds_dict = json.loads(GOOGLE_CREDENTIALS)
     creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
-    client = gspread.authorize(creds)
+    client = gspread.authorize(creds, http_client=RetryingHTTPClient)
     print("[INFO] Connected to Google Sheets successfully.")
-    return client.open(SHEET_NAME)
+    return client
 
 
-def read_sheet_to_df(sheet, tab_name):
-    """Read a tab from Google Sheets into a DataFrame."""
-    worksheet = sheet.worksheet(tab_name)
-    data = worksheet.get_all_records()
-    df = pd.DataFrame(data)
+def find_sheet_file(client):
+    """Drive metadata (id, modifiedTime, ...) for SHEET_NAME, without opening the sheet."""
+    for sheet_file in client.list_spreadsheet_files(SHEET_NAME):
+        if sheet_file["name"] == SHEET_NAME:
+            return sheet_file
+    raise gspread.SpreadsheetNotFound(f"Spreadsheet '{SHEET_NAME}' not found")
+
+
+def values_to_df(values, tab_name):
+    """Build a DataFrame from a raw 2D list of sheet values (header row first)."""
+    if not values:
+        print(f"[WARN] '{tab_name}' sheet is empty.")
+        return pd.DataFrame()
+    # The Sheets API drops trailing empty cells, and data may sit under blank
+    # header cells, so pad the header and every row to the widest row
+    width = max(map(len, values))
+    header, *rows = [row + [""] * (width - len(row)) for row in values]
+    df = pd.DataFrame(rows, columns=header).rename(columns=str.strip)
+    df = df.loc[:, df.columns != ""]
+    if "Player" in df.columns:
+        # Arrow-backed strings let player_keys() lower/strip in vectorized C++ kernels
+        df["Player"] = df["Player"].astype("string[pyarrow]")
     if df.empty:
         print(f"[WARN] '{tab_name}' sheet is empty.")
     return df
 
 
+def read_sheets_to_dfs(sheet, tab_names):
+    """Read several tabs from Google Sheets in a single request."""
+    resp = sheet.values_batch_get(list(tab_names))
+    return {
+        tab_name: values_to_df(value_range.get("values", []), tab_name)
+        for tab_name, value_range in zip(tab_names, resp["valueRanges"])
+    }
+
+
+def cached_tab_path(tab_name):
+    return os.path.join(SHEETS_CACHE_DIR, f"{tab_name}.parquet")
+
+
+def load_cached_tabs(modified_time, tab_names):
+    """Return the cached tabs if the sheet hasn't changed since they were saved."""
+    paths = {tab_name: cached_tab_path(tab_name) for tab_name in tab_names}
+    if not (os.path.exists(LAST_MODIFIED_FILE) and all(map(os.path.exists, paths.values()))):
+        return None
+    with open(LAST_MODIFIED_FILE) as f:
+        if f.read().strip() != modified_time:
+            return None
+    try:
+        return {tab_name: pd.read_parquet(path) for tab_name, path in paths.items()}
+    except CACHE_ERRORS as e:
+        print(f"[WARN] Ignoring unreadable sheet cache: {e}")
+        return None
+
+
+def save_cached_tabs(tabs, modified_time):
+    """Persist the tabs and the sheet's modifiedTime, each via an atomic rename.
+
+    A failed write only logs a warning; the report doesn't depend on the cache.
+    """
+    try:
+        os.makedirs(SHEETS_CACHE_DIR, exist_ok=True)
+        for tab_name, df in tabs.items():
+            path = cached_tab_path(tab_name)
+            df.to_parquet(path + ".tmp")
+            os.replace(path + ".tmp", path)
+        # Timestamp goes last so it never points at stale tab files
+        tmp_stamp = LAST_MODIFIED_FILE + ".tmp"
+        with open(tmp_stamp, "w") as f:
+            f.write(modified_time)
+        os.replace(tmp_stamp, LAST_MODIFIED_FILE)
+    except CACHE_ERRORS as e:
+        print(f"[WARN] Could not write sheet cache: {e}")
+
+
+def trim_projections(df):
+    """Keep only the Player and category columns, with categories parsed as numbers."""
+    if df.empty:
+        return df
+    cols = ["Player"] + [cat for cat in CATS if cat in df.columns]
+    df = df[cols]
+    return df.assign(**df[cols[1:]].apply(pd.to_numeric, errors="coerce").fillna(0.0))
+
+
 # --- Z-SCORE CALCULATION ---
 def calculate_zscores(df):
-    df_z = df.copy()
+    """Add "<cat>_z" and z_total columns; categories must already be numeric (trim_projections)."""
+    cats = [cat for cat in CATS if cat in df.columns]
     for cat in CATS:
-        if cat not in df_z.columns:
+        if cat not in cats:
             print(f"[WARN] Missing category: {cat}")
-            continue
-        mean = df_z[cat].mean()
-        std = df_z[cat].std()
-        df_z[cat + "_z"] = (df_z[cat] - mean) / std if std != 0 else 0
-    z_cols = [c + "_z" for c in CATS if c + "_z" in df_z.columns]
-    df_z["z_total"] = df_z[z_cols].sum(axis=1)
-    return df_z
 
+    # One NumPy pass over the whole category block
+    z, total = zscore_kernel(df[cats].to_numpy(dtype=np.float64))
+    return df.assign(**{cat + "_z": z[:, i] for i, cat in enumerate(cats)}, z_total=total)
+
+
+def zscore_kernel(arr):
+    """Column z-scores and their row totals for a (players x categories) array."""
+    std = arr.std(axis=0, ddof=1) if len(arr) > 1 else np.zeros(arr.shape[1])
+    std[std == 0] = 1.0
+    # Work in a single output buffer rather than allocating a temporary per step
+    z = np.subtract(arr, arr.mean(axis=0))
+    np.divide(z, std, out=z)
+    return z, z.sum(axis=1)
 
-def match_players(df_proj, df_players):
-    """Merge roster/waiver with projections."""
-    df_players["Player_lower"] = df_players["Player"].str.lower()
-    df_proj["Player_lower"] = df_proj["Player"].str.lower()
-    merged = pd.merge(df_players, df_proj, on="Player_lower", how="left", suffixes=("_team", ""))
-    merged.drop(columns=["Player_lower"], inplace=True)
-    merged["Player"] = merged["Player"].fillna(merged["Player_team"])
-    return merged
+
+def player_keys(players):
+    """Normalized join key for a Player column."""
+    return players.str.lower().str.strip()
+
+
+def key_projections(df_proj):
+    """One row per player key, with "_key" as a categorical over those keys."""
+    df_proj = df_proj.assign(_key=player_keys(df_proj["Player"]))
+    df_proj = df_proj.drop_duplicates(subset="_key", ignore_index=True)
+    df_proj["_key"] = df_proj["_key"].astype(pd.CategoricalDtype(categories=df_proj["_key"]))
+    return df_proj
+
+
+def fuzzy_match_keys(df_proj, player_frames):
+    """Map sheet player keys with no exact projection hit onto an unclaimed projection key.
+
+    Projection keys that some roster/waiver player already matches exactly are
+    never fuzzy targets, and ambiguous matches are refused: the runner-up scores
+    within FUZZY_MARGIN of the best, or two sheet names land on one projection.
+    """
+    proj_keys = df_proj["_key"].dtype.categories
+    keys = pd.concat([player_keys(df["Player"]) for df in player_frames]).unique()
+    exact = proj_keys.get_indexer(keys) >= 0
+    missing = list(keys[~exact])
+    claimed = set(keys[exact])
+    choices = [k for k in proj_keys if k not in claimed]
+    if not missing or not choices:
+        return {}
+    # Imported lazily: most runs match every name exactly and never need it
+    from rapidfuzz import process, fuzz
+
+    scores = process.cdist(missing, choices, scorer=fuzz.WRatio, workers=-1)
+    order = np.argsort(scores, axis=1)
+    rows = np.arange(len(missing))
+    best = order[:, -1]
+    best_score = scores[rows, best]
+    runner_up = scores[rows, order[:, -2]] if len(choices) > 1 else np.zeros(len(missing))
+    keep = (best_score >= FUZZY_CUTOFF) & (best_score - runner_up >= FUZZY_MARGIN)
+    keep &= np.bincount(best[keep], minlength=len(choices))[best] == 1
+    mapping = {name: choices[idx] for name, idx, ok in zip(missing, best, keep) if ok}
+    if mapping:
+        print(f"[INFO] Fuzzy-matched {len(mapping)} of {len(missing)} unmatched player names.")
+    return mapping
+
+
+def match_players(df_proj, df_players, fuzzy_keys):
+    """Attach projected z_total to roster/waiver players (NaN where unmatched)."""
+    proj_keys = df_proj["_key"].dtype.categories
+    keys = player_keys(df_players["Player"])
+    # The categories are the projection keys in row order, so their indexer
+    # gives projection row positions (-1 where unmatched)
+    exact = proj_keys.get_indexer(keys)
+    rows = np.where(exact >= 0, exact, proj_keys.get_indexer(keys.map(fuzzy_keys)))
+    hit = rows >= 0
+
+    # Fill preallocated columns by position instead of merging whole frames.
+    # Exact hits take the projection's spelling; fuzzy hits keep the sheet's name.
+    names = df_players["Player"].to_numpy(dtype=object, copy=True)
+    z_arr = np.full(len(rows), np.nan)
+    names[exact >= 0] = df_proj["Player"].to_numpy()[exact[exact >= 0]]
+    z_arr[hit] = df_proj["z_total"].to_numpy()[rows[hit]]
+    return pd.DataFrame({"Player": names, "z_total": z_arr})
 
 
 def recommend_add_drop(roster_z, waiver_z):
-    roster_z = roster_z.sort_values(by="z_total").reset_index(drop=True)
-    waiver_z = waiver_z.sort_values(by="z_total", ascending=False).reset_index(drop=True)
+    # Only the single worst/best rows are needed, so skip the full sorts.
+    # Unmatched players (NaN z_total) rank last, as they did with sort_values.
+    rz = roster_z["z_total"].to_numpy(dtype=np.float64)
+    wz = waiver_z["z_total"].to_numpy(dtype=np.float64)
 
-    worst = roster_z.iloc[0]
-    best = waiver_z.iloc[0]
+    worst = roster_z.iloc[np.argmin(np.where(np.isnan(rz), np.inf, rz))]
+    best = waiver_z.iloc[np.argmax(np.where(np.isnan(wz), -np.inf, wz))]
     gain = best["z_total"] - worst["z_total"]
 
     return {"drop": worst["Player"], "add": best["Player"], "gain": gain}
 
 
 # --- SLACK NOTIFICATION ---
+def report_hash(message):
+    return hashlib.blake2b(message.encode(), digest_size=8).hexdigest()
+
+
+def read_last_report_hash():
+    if not os.path.exists(LAST_REPORT_HASH_FILE):
+        return None
+    with open(LAST_REPORT_HASH_FILE) as f:
+        return f.read().strip()
+
+
+def write_last_report_hash(digest):
+    with open(LAST_REPORT_HASH_FILE, "w") as f:
+        f.write(digest)
+
+
 def send_to_slack(message):
+    """Post the report; returns True only if Slack accepted it."""
     if not SLACK_TOKEN:
         print("[WARN] No Slack token found — skipping Slack notification.")
-        return
-    client = WebClient(token=SLACK_TOKEN)
+        return False
+    # Imported lazily so no-post runs (missing token, unchanged report) skip slack_sdk
+    from slack_sdk import WebClient
+    from slack_sdk.errors import SlackApiError
+    from slack_sdk.http_retry.builtin_handlers import (
+        ConnectionErrorRetryHandler,
+        RateLimitErrorRetryHandler,
+        ServerErrorRetryHandler,
+    )
+
+    client = WebClient(
+        token=SLACK_TOKEN,
+        retry_handlers=[
+            ConnectionErrorRetryHandler(max_retry_count=HTTP_MAX_RETRIES),
+            RateLimitErrorRetryHandler(max_retry_count=HTTP_MAX_RETRIES),
+            ServerErrorRetryHandler(max_retry_count=HTTP_MAX_RETRIES),
+        ],
+    )
     try:
         client.chat_postMessage(channel=SLACK_CHANNEL, text=message)
         print("[INFO] Slack message sent successfully.")
+        return True
     except SlackApiError as e:
         print(f"[ERROR] Slack post failed: {e.response['error']}")
+        return False
+
+
+def post_report(message, force=False):
+    """Send the report unless it matches the last one posted (or force is set)."""
+    digest = report_hash(message)
+    if not force and digest == read_last_report_hash():
+        print("[INFO] Report unchanged since last post — skipping Slack (use --force to re-post).")
+        return
+    print("[INFO] Sending report to Slack...")
+    if send_to_slack(message):
+        write_last_report_hash(digest)
 
 
 # --- MAIN WORKFLOW ---
-def main():
+def main(force=False):
     print("🏀 Starting daily Fantasy NBA update...")
 
-    sh = connect_to_sheet()
+    client = connect_to_sheets()
 
-    print("[INFO] Loading projections, roster, and waiver tabs...")
-    proj_df = read_sheet_to_df(sh, "projections")
-    roster_df = read_sheet_to_df(sh, "roster")
-    waiver_df = read_sheet_to_df(sh, "waiver")
+    # The Drive listing already carries modifiedTime, so a cache hit never opens the sheet
+    sheet_file = find_sheet_file(client)
+    modified_time = sheet_file["modifiedTime"]
+    tabs = load_cached_tabs(modified_time, SHEET_TABS)
+    if tabs is None:
+        print("[INFO] Loading projections, roster, and waiver tabs...")
+        tabs = read_sheets_to_dfs(client.open_by_key(sheet_file["id"]), SHEET_TABS)
+        tabs["projections"] = trim_projections(tabs["projections"])
+        save_cached_tabs(tabs, modified_time)
+    else:
+        print(f"[INFO] Sheet unchanged since {modified_time} — using cached tabs.")
+    proj_df, roster_df, waiver_df = tabs["projections"], tabs["roster"], tabs["waiver"]
 
     if proj_df.empty or roster_df.empty or waiver_df.empty:
         raise ValueError("One or more sheets (projections/roster/waiver) are empty!")
@@ -112,9 +345,10 @@ def main():
     print(f"[INFO] Roster: {len(roster_df)} rows")
     print(f"[INFO] Waiver pool: {len(waiver_df)} rows")
 
-    proj_z = calculate_zscores(proj_df)
-    roster_z = match_players(proj_z, roster_df)
-    waiver_z = match_players(proj_z, waiver_df)
+    proj_z = key_projections(calculate_zscores(proj_df))
+    fuzzy_keys = fuzzy_match_keys(proj_z, [roster_df, waiver_df])
+    roster_z = match_players(proj_z, roster_df, fuzzy_keys)
+    waiver_z = match_players(proj_z, waiver_df, fuzzy_keys)
 
     move = recommend_add_drop(roster_z, waiver_z)
 
@@ -129,10 +363,11 @@ def main():
         f"🕒 Auto-updated from Google Sheets"
     )
 
-    print("[INFO] Sending report to Slack...")
-    send_to_slack(msg)
+    post_report(msg, force=force)
     print("✅ Finished Fantasy NBA daily update.")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Daily Fantasy NBA add/drop report.")
+    parser.add_argument("--force", action="store_true", help="post to Slack even if the report is unchanged")
+    main(force=parser.parse_args().force)
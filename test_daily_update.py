@@ -0,0 +1,260 @@
+import json
+
+import gspread
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+import daily_update
+
+# Deprecations in pandas/pyarrow paths should fail here, not in a future release
+pytestmark = pytest.mark.filterwarnings("error")
+
+
+def test_values_to_df_pads_short_rows():
+    df = daily_update.values_to_df([["Player", "PTS", "REB"], ["A", "1"]], "roster")
+    assert df.columns.tolist() == ["Player", "PTS", "REB"]
+    assert df.iloc[0].tolist() == ["A", "1", ""]
+
+
+def test_values_to_df_drops_data_under_blank_headers():
+    df = daily_update.values_to_df([["Player", "PTS"], ["A", "1", "note"], ["B", "2"]], "roster")
+    assert df.columns.tolist() == ["Player", "PTS"]
+    assert df["Player"].tolist() == ["A", "B"]
+    assert df["PTS"].tolist() == ["1", "2"]
+
+
+def test_values_to_df_empty_sheet():
+    assert daily_update.values_to_df([], "roster").empty
+
+
+def test_cached_tabs_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(daily_update, "SHEETS_CACHE_DIR", str(tmp_path / "sheets_cache"))
+    monkeypatch.setattr(daily_update, "LAST_MODIFIED_FILE", str(tmp_path / "last_modified.txt"))
+    tabs = {
+        "projections": daily_update.values_to_df([["Player", "PTS"], ["A", "1"]], "projections"),
+        "roster": daily_update.values_to_df([["Player"], ["A"]], "roster"),
+    }
+    daily_update.save_cached_tabs(tabs, "2026-01-01T00:00:00.000Z")
+
+    assert daily_update.load_cached_tabs("2026-01-02T00:00:00.000Z", tabs) is None
+    cached = daily_update.load_cached_tabs("2026-01-01T00:00:00.000Z", tabs)
+    assert cached["projections"].equals(tabs["projections"])
+    assert cached["roster"]["Player"].tolist() == ["A"]
+
+
+def _api_error(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({"error": {"code": status, "message": "x", "status": "x"}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+def test_retrying_http_client_gives_up_after_max_retries(monkeypatch):
+    calls = []
+
+    def fail(self, *args, **kwargs):
+        calls.append(args)
+        raise _api_error(503)
+
+    monkeypatch.setattr(gspread.HTTPClient, "request", fail)
+    monkeypatch.setattr(daily_update.time, "sleep", lambda seconds: None)
+    client = object.__new__(daily_update.RetryingHTTPClient)
+    with pytest.raises(gspread.exceptions.APIError):
+        client.request("get", "https://example.invalid")
+    assert len(calls) == daily_update.HTTP_MAX_RETRIES + 1
+
+
+def test_retrying_http_client_does_not_retry_client_errors(monkeypatch):
+    calls = []
+
+    def fail(self, *args, **kwargs):
+        calls.append(args)
+        raise _api_error(404)
+
+    monkeypatch.setattr(gspread.HTTPClient, "request", fail)
+    client = object.__new__(daily_update.RetryingHTTPClient)
+    with pytest.raises(gspread.exceptions.APIError):
+        client.request("get", "https://example.invalid")
+    assert len(calls) == 1
+
+
+def _keyed_projections(names, z_totals):
+    return daily_update.key_projections(pd.DataFrame({"Player": names, "z_total": z_totals}))
+
+
+def _players(names):
+    return daily_update.values_to_df([["Player"]] + [[name] for name in names], "players")
+
+
+def test_fuzzy_match_skips_projections_already_on_a_sheet():
+    proj = _keyed_projections(["Nikola Jokic", "Bench Guy", "Other"], [5.0, -2.0, 0.0])
+    roster, waiver = _players(["Bench Guy", "Nikola Jokic"]), _players(["Nikola Jovic"])
+
+    fuzzy_keys = daily_update.fuzzy_match_keys(proj, [roster, waiver])
+    roster_z = daily_update.match_players(proj, roster, fuzzy_keys)
+    waiver_z = daily_update.match_players(proj, waiver, fuzzy_keys)
+
+    assert fuzzy_keys == {}
+    assert waiver_z["Player"].tolist() == ["Nikola Jovic"]
+    assert np.isnan(waiver_z["z_total"].iloc[0])
+    assert daily_update.recommend_add_drop(roster_z, waiver_z)["add"] != "Nikola Jokic"
+
+
+def test_fuzzy_match_refuses_near_ties_and_keeps_sheet_name():
+    proj = _keyed_projections(["Jalen Williams", "Jaylin Williams", "Luka Doncic"], [1.0, 2.0, 3.0])
+    players = _players(["Jaylen Williams", "Luka Donic "])
+
+    fuzzy_keys = daily_update.fuzzy_match_keys(proj, [players])
+    matched = daily_update.match_players(proj, players, fuzzy_keys)
+
+    assert "jaylen williams" not in fuzzy_keys
+    assert fuzzy_keys.get("luka donic") == "luka doncic"
+    assert matched["Player"].tolist() == ["Jaylen Williams", "Luka Donic "]
+    assert np.isnan(matched["z_total"].iloc[0])
+    assert matched["z_total"].iloc[1] == 3.0
+
+
+class _FakeSheet:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def values_batch_get(self, ranges):
+        self.calls.append("values_batch_get")
+        return {"valueRanges": [
+            {"values": [["Player", "PTS", "REB"], ["A", "10", "5"], ["B", "20", "3"], ["C", "15", "8"]]},
+            {"values": [["Player"], ["A"]]},
+            {"values": [["Player"], ["B"]]},
+        ]}
+
+
+class _FakeClient:
+    def __init__(self, modified_time):
+        self.calls = []
+        self.modified_time = modified_time
+
+    def list_spreadsheet_files(self, title):
+        self.calls.append("list_spreadsheet_files")
+        return [{"id": "sheet-id", "name": title, "modifiedTime": self.modified_time}]
+
+    def open_by_key(self, key):
+        self.calls.append("open_by_key")
+        return _FakeSheet(self.calls)
+
+
+@pytest.fixture
+def cache_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(daily_update, "SHEETS_CACHE_DIR", str(tmp_path / "sheets_cache"))
+    monkeypatch.setattr(daily_update, "LAST_MODIFIED_FILE", str(tmp_path / "last_modified.txt"))
+    monkeypatch.setattr(daily_update, "LAST_REPORT_HASH_FILE", str(tmp_path / ".last_report_hash"))
+    monkeypatch.setattr(daily_update, "send_to_slack", lambda message: True)
+    return tmp_path
+
+
+def test_main_cache_hit_skips_opening_the_sheet(cache_files, monkeypatch):
+    client = _FakeClient("t1")
+    monkeypatch.setattr(daily_update, "connect_to_sheets", lambda: client)
+
+    daily_update.main()
+    assert client.calls == ["list_spreadsheet_files", "open_by_key", "values_batch_get"]
+
+    client.calls.clear()
+    daily_update.main()
+    assert client.calls == ["list_spreadsheet_files"]
+
+
+def test_cache_write_and_read_failures_only_warn(cache_files):
+    tabs = {"roster": daily_update.values_to_df([["Player", "PTS", "PTS"], ["A", "1", "2"]], "roster")}
+    daily_update.save_cached_tabs(tabs, "t1")  # parquet rejects duplicate column names
+    assert not (cache_files / "last_modified.txt").exists()
+
+    (cache_files / "sheets_cache").mkdir(exist_ok=True)
+    (cache_files / "sheets_cache" / "roster.parquet").write_bytes(b"not parquet")
+    (cache_files / "last_modified.txt").write_text("t1")
+    assert daily_update.load_cached_tabs("t1", ["roster"]) is None
+
+
+def test_calculate_zscores_matches_pandas_sample_std():
+    proj = daily_update.trim_projections(daily_update.values_to_df(
+        [["Player", "PTS", "REB", "AST"], ["A", "10", "5", "2"], ["B", "20", "5", "x"], ["C", "15", "8", "4"]],
+        "projections",
+    ))
+    z = daily_update.calculate_zscores(proj)
+
+    for cat in ["PTS", "REB", "AST"]:
+        expected = (proj[cat] - proj[cat].mean()) / proj[cat].std()
+        np.testing.assert_allclose(z[cat + "_z"], expected)
+    np.testing.assert_allclose(z["z_total"], z[["PTS_z", "REB_z", "AST_z"]].sum(axis=1))
+
+
+def test_calculate_zscores_zero_variance_gives_zero():
+    z = daily_update.calculate_zscores(pd.DataFrame({"Player": ["A", "B"], "PTS": [7.0, 7.0]}))
+    assert z["PTS_z"].tolist() == [0.0, 0.0]
+
+
+def test_key_projections_categories_are_row_positions():
+    proj = _keyed_projections(["A", "B", " a", "C"], [1.0, 2.0, 3.0, 4.0])
+
+    assert proj["_key"].tolist() == ["a", "b", "c"]
+    assert proj["z_total"].tolist() == [1.0, 2.0, 4.0]  # first duplicate wins
+    categories = proj["_key"].dtype.categories
+    assert categories.get_indexer(["c", "a", "b"]).tolist() == [2, 0, 1]
+
+
+def test_match_players_uses_first_duplicate_and_nan_for_unmatched():
+    proj = _keyed_projections(["Alpha Guy", "Bravo Man", "alpha guy "], [1.0, 2.0, 9.0])
+    players = _players([" ALPHA GUY", "Zulu Person"])
+
+    matched = daily_update.match_players(proj, players, {})
+
+    assert matched["Player"].tolist() == ["Alpha Guy", "Zulu Person"]
+    assert matched["z_total"].iloc[0] == 1.0
+    assert np.isnan(matched["z_total"].iloc[1])
+
+
+def test_recommend_add_drop_ranks_unmatched_players_last():
+    roster_z = pd.DataFrame({"Player": ["Unmatched", "Weak", "Strong"], "z_total": [np.nan, -1.0, 3.0]})
+    waiver_z = pd.DataFrame({"Player": ["Unmatched", "Good", "Okay"], "z_total": [np.nan, 2.0, 0.5]})
+
+    move = daily_update.recommend_add_drop(roster_z, waiver_z)
+
+    assert move == {"drop": "Weak", "add": "Good", "gain": 3.0}
+
+
+def _record_posts(monkeypatch, ok=True):
+    posts = []
+
+    def send(message):
+        posts.append(message)
+        return ok
+
+    monkeypatch.setattr(daily_update, "send_to_slack", send)
+    return posts
+
+
+def test_post_report_skips_unchanged_report(cache_files, monkeypatch):
+    posts = _record_posts(monkeypatch)
+    daily_update.post_report("report")
+    daily_update.post_report("report")
+    daily_update.post_report("new report")
+    assert posts == ["report", "new report"]
+
+
+def test_post_report_force_posts_unchanged_report(cache_files, monkeypatch):
+    posts = _record_posts(monkeypatch)
+    daily_update.post_report("report")
+    daily_update.post_report("report", force=True)
+    assert posts == ["report", "report"]
+
+
+def test_post_report_failed_send_keeps_last_hash(cache_files, monkeypatch):
+    _record_posts(monkeypatch)
+    daily_update.post_report("report")
+    hash_file = cache_files / ".last_report_hash"
+    before = hash_file.read_text()
+
+    posts = _record_posts(monkeypatch, ok=False)
+    daily_update.post_report("new report")
+    assert posts == ["new report"]
+    assert hash_file.read_text() == before